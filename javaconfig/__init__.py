@@ -1 +1,2 @@
 from .javaconfig import JavaConfigurations
+from .launcher import compile_launcher, launcher_is_stale
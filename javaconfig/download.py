@@ -0,0 +1,180 @@
+"""Streaming, resumable downloads into the local Maven repository.
+
+Files are downloaded in fixed-size chunks to a ".part" file next to
+their final location. If a download is interrupted, the next attempt
+asks the server for the rest of the file with an HTTP Range request.
+Only a complete (and, where the repository publishes a SHA-1, verified)
+file is renamed into place, so nobody ever sees a partial jar. The
+".part" file is locked while it's being written, so concurrent
+downloads of the same file wait for each other instead of colliding.
+"""
+
+import os
+import re
+import fcntl
+import hashlib
+import requests
+
+CHUNK_SIZE = 64 * 1024
+RETRIES = 3
+TIMEOUT = 30
+
+
+def _local_path(uri):
+    return "/%s" % re.sub("^file:/+", "", uri)
+
+
+def _expected_sha1(uri):
+    if uri.startswith("file:"):
+        try:
+            with open(_local_path(uri + ".sha1")) as sha1:
+                text = sha1.read()
+        except OSError:
+            return None
+    else:
+        try:
+            resp = requests.get(uri + ".sha1", timeout=TIMEOUT)
+        except requests.RequestException:
+            return None
+        if resp.status_code != 200:
+            return None
+        text = resp.text
+    # The file may be "checksum" or "checksum  filename"
+    match = re.match(r"\s*([0-9a-fA-F]{40})", text)
+    return match.group(1).lower() if match else None
+
+
+class _ServerError(Exception):
+    """The server answered, but not with the file or a clean "not found"."""
+
+
+def _discard(partname):
+    try:
+        os.unlink(partname)
+    except FileNotFoundError:
+        pass
+
+
+def _fetch(uri, part, verbose):
+    """Append the rest of uri to part. Returns True when it's complete,
+    False if it isn't (yet), and None if there's no such file."""
+    offset = os.fstat(part.fileno()).st_size
+
+    if uri.startswith("file:"):
+        try:
+            with open(_local_path(uri), "rb") as source:
+                source.seek(offset)
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                    part.write(chunk)
+        except (FileNotFoundError, IsADirectoryError):
+            return None
+        part.flush()
+        return True
+
+    # Byte ranges and lengths must refer to the file itself
+    headers = {"Accept-Encoding": "identity"}
+    if offset > 0:
+        headers["Range"] = "bytes=%d-" % offset
+        if verbose:
+            print("Resume %s at %d" % (uri, offset))
+
+    with requests.get(uri, headers=headers, stream=True,
+                      allow_redirects=True, timeout=TIMEOUT) as resp:
+        if resp.status_code == 416:
+            # Range not satisfiable: we may already have all of it
+            total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit() and int(total) == offset:
+                return True
+            part.truncate(0)
+            return False
+        if resp.status_code in (404, 410):
+            # Not an error; repositories are probed for files all the time
+            if verbose:
+                print(resp.status_code, "from", uri)
+            return None
+        if resp.status_code == 200:
+            # The server ignored the range; start over
+            part.truncate(0)
+        elif resp.status_code != 206:
+            print(resp.status_code, "from", uri)
+            raise _ServerError(resp.status_code)
+
+        for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+            part.write(chunk)
+        part.flush()
+
+        length = resp.headers.get("Content-Length")
+        if length is not None and resp.status_code == 206:
+            return os.fstat(part.fileno()).st_size == offset + int(length)
+        if length is not None:
+            return os.fstat(part.fileno()).st_size == int(length)
+        return True
+
+
+def download(uri, dest, verbose=False):
+    """ Download uri to dest. Returns True if dest exists afterwards, None if
+    the repository doesn't have the file, and False if the download failed. """
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    partname = "%s.part" % dest
+
+    while True:
+        with open(partname, "a+b") as part:
+            fcntl.flock(part.fileno(), fcntl.LOCK_EX)
+
+            # Whoever held the lock before us may have removed or renamed
+            # the part file we opened; if so, start again with a new one.
+            try:
+                current = os.stat(partname).st_ino == os.fstat(part.fileno()).st_ino
+            except FileNotFoundError:
+                current = False
+            if not current:
+                continue
+
+            if os.path.exists(dest):
+                # Someone else finished it while we waited for the lock
+                _discard(partname)
+                return True
+
+            return _download_locked(uri, dest, partname, part, verbose)
+
+
+def _download_locked(uri, dest, partname, part, verbose):
+    result = False
+    for _ in range(RETRIES):
+        try:
+            result = _fetch(uri, part, verbose)
+        except _ServerError:
+            result = False
+            break
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError) as err:
+            if verbose:
+                print("Interrupted download of %s: %s" % (uri, err))
+            part.flush()
+            continue
+        if result is not False:
+            break
+
+    if result is not True:
+        # Keep the part file, if there is one; the next attempt can resume it
+        if os.fstat(part.fileno()).st_size == 0:
+            _discard(partname)
+        return result
+
+    part.flush()
+    os.fsync(part.fileno())
+
+    expected = _expected_sha1(uri)
+    if expected:
+        digest = hashlib.sha1()
+        part.seek(0)
+        for chunk in iter(lambda: part.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+        if digest.hexdigest() != expected:
+            print("Checksum mismatch, discarding:", uri)
+            _discard(partname)
+            return False
+
+    # We hold the lock on partname, so this is our file to rename
+    os.replace(partname, dest)
+    return True
@@ -0,0 +1,209 @@
+"""Analyze the jar files on a classpath.
+
+Each jar's entry list is read from its zip central directory and cached
+by the jar's SHA-1 checksum, so a jar is only opened the first time it's
+seen. The analysis reports duplicate classes, split packages, and
+multiple versions of the same Maven artifact, and can work out which
+jars are completely shadowed by jars earlier on the classpath.
+"""
+
+import os
+import json
+import hashlib
+import zipfile
+
+# Entries that every jar has, or that never affect class loading.
+# They don't count when deciding if one jar shadows another.
+IGNORED_PREFIXES = ("META-INF/maven/",)
+IGNORED_ENTRIES = ("META-INF/MANIFEST.MF", "META-INF/INDEX.LIST", "module-info.class")
+IGNORED_SUFFIXES = (".SF", ".RSA", ".DSA", ".EC")
+
+
+def default_cache_dir():
+    """ Return the default location of the jar index cache. """
+    cache = os.environ.get("XDG_CACHE_HOME", "%s/.cache" % os.environ["HOME"])
+    return os.path.join(cache, "javaconfig", "jars")
+
+
+class JarIndex:
+    """A cache of jar entry lists, keyed by checksum."""
+
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+        self.cache_dir = cache_dir
+        self._checksums_file = os.path.join(cache_dir, "checksums.json")
+        self._checksums = None
+        self._dirty = False
+
+    def _write_json(self, filename, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp = "%s.%d.tmp" % (filename, os.getpid())
+        with open(temp, "w") as out:
+            json.dump(data, out)
+        os.replace(temp, filename)
+
+    def checksum(self, path):
+        """ Return the SHA-1 checksum of a jar, reusing it if the jar hasn't changed. """
+        if self._checksums is None:
+            try:
+                with open(self._checksums_file) as data:
+                    self._checksums = json.load(data)
+            except (OSError, ValueError):
+                self._checksums = {}
+
+        stat = os.stat(path)
+        cached = self._checksums.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        digest = hashlib.sha1()
+        with open(path, "rb") as jar:
+            for chunk in iter(lambda: jar.read(1024 * 1024), b""):
+                digest.update(chunk)
+        self._checksums[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        self._dirty = True
+        return digest.hexdigest()
+
+    def entries(self, path):
+        """ Return the list of file entries in a jar, or None if it isn't a jar. """
+        if not os.path.isfile(path):
+            return None
+
+        checksum = self.checksum(path)
+        cached = os.path.join(self.cache_dir, "%s.json" % checksum)
+        try:
+            with open(cached) as data:
+                return json.load(data)
+        except (OSError, ValueError):
+            pass
+
+        try:
+            with zipfile.ZipFile(path) as jar:
+                entries = [name for name in jar.namelist() if not name.endswith("/")]
+        except (zipfile.BadZipFile, OSError):
+            return None
+
+        try:
+            self._write_json(cached, entries)
+        except OSError:
+            pass
+        return entries
+
+    def save(self):
+        """ Save any new checksums. """
+        if self._dirty:
+            try:
+                self._write_json(self._checksums_file, self._checksums)
+            except OSError:
+                pass
+            self._dirty = False
+
+
+def _significant(entry):
+    if entry in IGNORED_ENTRIES or entry.startswith(IGNORED_PREFIXES):
+        return False
+    if entry.startswith("META-INF/") and entry.endswith(IGNORED_SUFFIXES):
+        return False
+    return True
+
+
+def _artifact(path):
+    # Maven repository layout: .../group/artifact/version/artifact-version[-classifier].jar
+    vdir = os.path.dirname(path)
+    adir = os.path.dirname(vdir)
+    version = os.path.basename(vdir)
+    artifact = os.path.basename(adir)
+    if os.path.basename(path).startswith("%s-%s" % (artifact, version)):
+        return adir, version
+    return None, None
+
+
+class ClasspathAnalysis:
+    """The result of analyzing a classpath."""
+
+    def __init__(self, classpath):
+        self.classpath = classpath
+        self.duplicate_classes = {}
+        self.split_packages = {}
+        self.versions = {}
+        self.redundant = []
+
+    def minimized(self):
+        """ Return the classpath without the redundant jars. """
+        return [path for path in self.classpath if path not in self.redundant]
+
+    def report(self):
+        """ Print a summary of the analysis. """
+        overlaps = {}
+        for jars in self.duplicate_classes.values():
+            key = tuple(jars)
+            overlaps[key] = overlaps.get(key, 0) + 1
+        for jars, count in overlaps.items():
+            print("Duplicate classes (%d), first one wins:" % count)
+            for jar in jars:
+                print("\t%s" % jar)
+
+        for package, jars in self.split_packages.items():
+            print("Split package %s:" % package)
+            for jar in jars:
+                print("\t%s" % jar)
+
+        for artifact, versions in self.versions.items():
+            print("Multiple versions of %s:" % artifact)
+            for version in versions:
+                print("\t%s" % version)
+
+        for jar in self.redundant:
+            print("Redundant:", jar)
+
+
+def analyze(classpath, cache_dir=None):
+    """ Analyze the jars on the classpath. """
+    index = JarIndex(cache_dir)
+    analysis = ClasspathAnalysis(classpath)
+
+    classes = {}
+    packages = {}
+    versions = {}
+    seen = set()
+
+    for path in classpath:
+        entries = index.entries(path)
+        if entries is None:
+            # Directories and anything else we can't read are opaque
+            continue
+
+        significant = set(entry for entry in entries if _significant(entry))
+        if significant and significant <= seen:
+            analysis.redundant.append(path)
+        seen |= significant
+
+        # Overlaps between versions of one artifact are reported as
+        # multiple versions, so classes and packages are tracked per
+        # artifact (the first jar of each), not per jar.
+        artifact, version = _artifact(path)
+        if artifact:
+            versions.setdefault(artifact, {}).setdefault(version, path)
+        owner = artifact or path
+
+        for entry in significant:
+            if entry.endswith(".class") and not entry.startswith("META-INF/"):
+                classes.setdefault(entry, {}).setdefault(owner, path)
+                package = os.path.dirname(entry).replace("/", ".")
+                packages.setdefault(package, {}).setdefault(owner, path)
+
+    index.save()
+
+    for entry, owners in classes.items():
+        if len(owners) > 1:
+            name = entry[:-len(".class")].replace("/", ".")
+            analysis.duplicate_classes[name] = list(owners.values())
+    for package, owners in packages.items():
+        if len(owners) > 1:
+            analysis.split_packages[package] = list(owners.values())
+    for artifact, found in versions.items():
+        if len(found) > 1:
+            analysis.versions[artifact] = list(found.values())
+
+    return analysis
@@ -6,9 +6,15 @@ import sys
 import os
 import re
 import glob
+import json
+import shutil
 import subprocess
+import xml.parsers.expat
 import xml.etree.ElementTree as ET
 import requests
+from . import jarindex
+from . import snapshot
+from .download import download
 
 # I suppose some of the methods could be functions. I don't care.
 # pylint: disable=R0201
@@ -20,11 +26,13 @@ class JavaConfigurations:
     """An API to parse a configuration file and construct Java environments."""
 
     XML_ID = "{http://www.w3.org/XML/1998/namespace}id"
+    INDEX_VERSION = 2
 
-    def __init__(self, config=None):
+    def __init__(self, config=None, lazy=False):
         self.repositories = []
         self.maven_plugin = "org.apache.maven.plugins:maven-dependency-plugin:3.2.0:get"
         self.mvn = "/usr/local/bin/mvn"
+        self.snapshot_update = snapshot.DEFAULT_POLICY
         self._configurations = {}
         self._tag_parser = {
             "maven": getattr(self, "_parse_maven"),
@@ -41,6 +49,14 @@ class JavaConfigurations:
 
         self._config = os.path.abspath(config)
         self._configdir = os.path.dirname(self._config)
+        self._index = None
+
+        if lazy:
+            self._index = self._load_index()
+            if self._index is not None:
+                for extent in self._index["maven-config"]:
+                    self._parse_maven_config(self._read_element(extent))
+                return
 
         tree = ET.ElementTree(file=config)
         root = tree.getroot()
@@ -50,6 +66,124 @@ class JavaConfigurations:
             else:
                 self._parse_config(node)
 
+    # In lazy mode, the configuration file is not parsed up front. Instead,
+    # a sidecar index records the byte range of each top-level element so
+    # that config() can parse only the configurations it actually needs.
+
+    def _index_file(self):
+        return "%s.idx" % self._config
+
+    def _load_index(self):
+        stat = os.stat(self._config)
+        try:
+            with open(self._index_file()) as idx:
+                index = json.load(idx)
+            if (index.get("version") == JavaConfigurations.INDEX_VERSION
+                    and index.get("mtime") == stat.st_mtime_ns
+                    and index.get("size") == stat.st_size):
+                return index
+        except (OSError, ValueError):
+            pass
+
+        index = self._build_index()
+        if index is None:
+            return None
+
+        index["mtime"] = stat.st_mtime_ns
+        index["size"] = stat.st_size
+        temp = "%s.%d.tmp" % (self._index_file(), os.getpid())
+        try:
+            # Write and rename so that a concurrent reader never sees
+            # half of an index
+            with open(temp, "w") as idx:
+                json.dump(index, idx)
+            os.replace(temp, self._index_file())
+        except OSError:
+            # The index is only an optimization; an unwritable directory
+            # just means we'll build it again next time.
+            pass
+        return index
+
+    def _build_index(self):
+        """Scan the configuration file for the extent of each configuration.
+        Returns None if the file can't safely be parsed in pieces."""
+        with open(self._config, "rb") as cfg:
+            data = cfg.read()
+
+        state = {"depth": 0, "encoding": "utf-8", "safe": True, "end": len(data)}
+        starts = []
+
+        def xml_decl(_version, encoding, _standalone):
+            if encoding:
+                state["encoding"] = encoding
+
+        def doctype(*_args):
+            # Entities and defaulted attributes won't survive slicing
+            state["safe"] = False
+
+        def start(name, attrs):
+            if state["depth"] == 0:
+                if any(attr.startswith("xmlns") for attr in attrs):
+                    state["safe"] = False
+            elif state["depth"] == 1:
+                starts.append((parser.CurrentByteIndex, name,
+                               attrs.get("xml:id")))
+            state["depth"] += 1
+
+        def end(_name):
+            state["depth"] -= 1
+            if state["depth"] == 0:
+                state["end"] = parser.CurrentByteIndex
+
+        parser = xml.parsers.expat.ParserCreate()
+        parser.XmlDeclHandler = xml_decl
+        parser.StartDoctypeDeclHandler = doctype
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.Parse(data, True)
+
+        if not state["safe"]:
+            return None
+
+        index = {
+            "version": JavaConfigurations.INDEX_VERSION,
+            "encoding": state["encoding"],
+            "maven-config": [],
+            "configs": {},
+        }
+
+        # Each element runs up to the start of the next one; anything in
+        # between is whitespace, comments, or PIs, all harmless to parse.
+        for pos, (offset, name, cfgid) in enumerate(starts):
+            if pos + 1 < len(starts):
+                extent = [offset, starts[pos + 1][0]]
+            else:
+                extent = [offset, state["end"]]
+            if name == "maven-config":
+                index["maven-config"].append(extent)
+            elif cfgid is not None:
+                index["configs"][cfgid] = extent
+            else:
+                print("Unreachable configuration without id:", name)
+
+        return index
+
+    def _read_element(self, extent):
+        with open(self._config, "rb") as cfg:
+            cfg.seek(extent[0])
+            data = cfg.read(extent[1] - extent[0])
+        parser = ET.XMLParser(encoding=self._index["encoding"])
+        parser.feed(data)
+        return parser.close()
+
+    def _lookup(self, cfgid):
+        if cfgid in self._configurations:
+            return self._configurations[cfgid]
+        if self._index is not None and cfgid in self._index["configs"]:
+            self._parse_config(self._read_element(self._index["configs"][cfgid]))
+            return self._configurations.get(cfgid)
+        return None
+
     def _parse_config(self, root):
         config = {"type": root.tag}
         if JavaConfigurations.XML_ID in root.attrib:
@@ -85,6 +219,11 @@ class JavaConfigurations:
             self.maven_plugin = node.attrib["dependency-plugin"]
         if "mvn" in node.attrib:
             self.mvn = node.attrib["mvn"]
+        if "snapshot-update" in node.attrib:
+            if snapshot.valid_policy(node.attrib["snapshot-update"]):
+                self.snapshot_update = node.attrib["snapshot-update"]
+            else:
+                print("Unrecognized snapshot update policy:", node.attrib["snapshot-update"])
         for child in node:
             if child.tag == "repo":
                 self.repositories.append(child.text)
@@ -150,7 +289,7 @@ class JavaConfigurations:
 
     def config(self, cfgid, ctype=None):
         """Return the configuration for a particular process."""
-        if cfgid not in self._configurations:
+        if self._lookup(cfgid) is None:
             return None
 
         # Make sure we apply the configurations in the right order,
@@ -161,8 +300,8 @@ class JavaConfigurations:
         extends = cfgid
         while extends:
             idlist.append(extends)
-            if extends in self._configurations:
-                parent = self._configurations[extends]
+            parent = self._lookup(extends)
+            if parent is not None:
                 extends = parent.extends()
             else:
                 print("Ignoring unknown parent:", extends)
@@ -193,6 +332,7 @@ class JavaConfig:
             "exec": None,
             "class": None,
             "extends": None,
+            "classpath-analysis": None,
             "maven": [],
             "classpath": [],
             "java-option": [],
@@ -334,6 +474,13 @@ class JavaConfig:
             jar
         )
 
+        if version.endswith("-SNAPSHOT"):
+            pomloc = os.path.join(os.path.dirname(jarloc), "%s-%s.pom" % (artifact, version))
+            if self._update_snapshot(group, artifact, version, classifier, jarloc, pomloc):
+                self._properties["jars"].append(jarloc)
+                self._configure_dependencies(pomloc, version, depth)
+                return
+
         if os.path.isfile(jarloc):
             self._properties["jars"].append(jarloc)
             return
@@ -384,48 +531,53 @@ class JavaConfig:
             return
 
 
-        mvn_args = [self._configurations.mvn,
-                    self._configurations.maven_plugin,
-                    "-DremoteRepositories=%s" % repo,
-                    "-DgroupId=%s" % group,
-                    "-DartifactId=%s" % artifact,
-                    "-Dversion=%s" % version]
-        if classifier != "":
-            mvn_args.append("-Dclassifier=%s" % classifier)
+        jarpath = "%s/%s/%s/%s" % (group.replace(".", "/"), artifact, version, jar)
 
         if self.verbose:
-            print("Run: ", " ".join(mvn_args))
+            print("Get: %s/%s" % (repo, jarpath))
+
+        if not download("%s/%s" % (repo, jarpath), jarloc, self.verbose):
+            mvn_args = [self._configurations.mvn,
+                        self._configurations.maven_plugin,
+                        "-DremoteRepositories=%s" % repo,
+                        "-DgroupId=%s" % group,
+                        "-DartifactId=%s" % artifact,
+                        "-Dversion=%s" % version]
+            if classifier != "":
+                mvn_args.append("-Dclassifier=%s" % classifier)
+
+            if self.verbose:
+                print("Run: ", " ".join(mvn_args))
 
-        resp = subprocess.run(mvn_args,
-                              capture_output=False, check=False
-                              )
+            resp = subprocess.run(mvn_args,
+                                  capture_output=False, check=False
+                                  )
 
-        if resp.returncode != 0:
-            print("Maven dependency download failed?")
+            if resp.returncode != 0:
+                print("Maven dependency download failed?")
 
         if not os.path.exists(jarloc):
             print("Failed to download %s:%s:%s" % (group, artifact, version))
             return
 
+        self._properties["jars"].append(jarloc)
 
-        pom_file = "%s/%s" % (repo, pom);
-        if pom_file.startswith("file:/"):
-            pom_file = pom_file[6:]
-            try:
-                with open(pom_file) as pom_data:
-                    resp = "\n".join(pom_data.readlines());
-            except FileNotFoundError:
-                print("Cannot read POM: %s/%s" % (repo, pom))
-                return
-        else:
-            resp = requests.get(pom_file);
-            if resp.status_code == 200:
-                resp = resp.text
-            else:
-                print("Cannot download POM: %s/%s" % (repo, pom))
-                return
+        pomloc = os.path.join(os.path.dirname(jarloc), os.path.basename(pom))
+        if not os.path.isfile(pomloc) and \
+           not download("%s/%s" % (repo, pom), pomloc, self.verbose):
+            print("Cannot download POM: %s/%s" % (repo, pom))
+            return
+
+        self._configure_dependencies(pomloc, version, depth)
+
+    def _configure_dependencies(self, pomloc, version, depth):
+        try:
+            tree = ET.parse(pomloc).getroot()
+        except ET.ParseError:
+            print("Cannot parse POM: %s" % pomloc)
+            return
 
-        tree = ET.fromstring(resp)
+        pom = os.path.basename(pomloc)
         dependencies = tree.find("{http://maven.apache.org/POM/4.0.0}dependencies")
         if dependencies:
             for dependency in dependencies.findall("{http://maven.apache.org/POM/4.0.0}dependency"):
@@ -441,6 +593,90 @@ class JavaConfig:
                     artifact = "%s:%s:%s" % (dgroup, dartifact, dversion)
                     self._configure_artifact(artifact, depth - 1, pom=pom)
 
+    # pylint: disable=R0913
+    def _update_snapshot(self, group, artifact, version, classifier, jarloc, pomloc):
+        """Bring a SNAPSHOT up to date according to the update policy.
+        Returns True if a new build was installed."""
+        policy = self._configurations.snapshot_update
+        marker = snapshot.MARKER % jarloc
+        present = os.path.isfile(jarloc) and os.path.isfile(pomloc)
+
+        # Every classifier of a SNAPSHOT is checked and updated on its own,
+        # so the main jar can't make a classifier jar look up to date
+        if present and not snapshot.is_stale(marker, policy):
+            return False
+        if present and snapshot.is_local(jarloc):
+            if self.verbose:
+                print("Using local build %s" % jarloc)
+            return False
+
+        if self.verbose:
+            print("Check for updates: %s:%s:%s:%s" % (group, artifact, version, classifier))
+
+        previous = None
+        if present:
+            previous = snapshot.installed(jarloc)
+
+        path = "%s/%s/%s" % (group.replace(".", "/"), artifact, version)
+        for repo in self._configurations.repositories:
+            # A complete download left behind by an earlier check is out
+            # of date, but a partial one is resumed
+            fetched = snapshot.fetched_metadata(jarloc, repo)
+            snapshot.discard(fetched)
+            if not download("%s/%s/maven-metadata.xml" % (repo, path), fetched, self.verbose):
+                continue
+
+            latest = snapshot.snapshot_versions(fetched, version, classifier)
+            snapshot.discard(fetched)
+            if latest is None:
+                continue
+
+            jarvalue, pomvalue = latest
+            if jarvalue == previous:
+                # Nothing new; recording it again records the time we checked
+                snapshot.record(jarloc, jarvalue)
+                return False
+
+            if classifier == "":
+                stamped = "%s-%s.jar" % (artifact, jarvalue)
+            else:
+                stamped = "%s-%s-%s.jar" % (artifact, jarvalue, classifier)
+
+            if self.verbose:
+                print("Update %s from %s" % (stamped, repo))
+
+            if (self._install_snapshot("%s/%s/%s" % (repo, path, stamped), jarloc)
+                    and self._install_snapshot("%s/%s/%s-%s.pom" % (repo, path, artifact, pomvalue),
+                                               pomloc)):
+                snapshot.record(jarloc, jarvalue)
+                return True
+
+        if present:
+            # Like Maven's lastUpdated files, a failed check counts as a
+            # check, so an unreachable repository isn't retried every time
+            snapshot.checked(jarloc)
+            if self.verbose:
+                print("Cannot check for updates, using %s" % jarloc)
+        return False
+
+    def _install_snapshot(self, uri, dest):
+        # Timestamped builds are kept, like Maven does, and copied to
+        # the -SNAPSHOT name; either way dest is replaced atomically.
+        stamped = os.path.join(os.path.dirname(dest), uri.rpartition("/")[2])
+        if stamped == dest:
+            stamped = "%s.download" % dest
+            if not download(uri, stamped, self.verbose):
+                return False
+            os.replace(stamped, dest)
+            return True
+
+        if not download(uri, stamped, self.verbose):
+            return False
+        temp = "%s.%d.tmp" % (dest, os.getpid())
+        shutil.copyfile(stamped, temp)
+        os.replace(temp, dest)
+        return True
+
     def _pom_text(self, node, name):
         value = node.find("{http://maven.apache.org/POM/4.0.0}%s" % name)
         if value is None:
@@ -497,8 +733,8 @@ class JavaConfig:
             else:
                 self.arguments.append(arg)
 
-    def run(self):
-        """ Run the process. """
+    def prepare(self):
+        """ Check that the process can be run and resolve its artifacts. """
 
         if not self.get_property("class"):
             raise RuntimeError("No class defined")
@@ -512,6 +748,35 @@ class JavaConfig:
             if not os.path.exists(epath):
                 raise RuntimeError("Specified executable does not exist")
 
+    def classpath(self):
+        """ Return the classpath, without duplicates. Call prepare() first.
+        If the configuration asks for it, the jars on the classpath are
+        analyzed and, when minimizing, redundant jars are removed. """
+        classpath = []
+        if self.get_property("classpath") or self.get_property("jars"):
+            cpset = set()
+            for path in self.get_property("classpath") + self.get_property("jars"):
+                if path not in cpset:
+                    classpath.append(path)
+                    cpset.add(path)
+
+        check = self.get_property("classpath-analysis")
+        if check in ("report", "minimize"):
+            analysis = jarindex.analyze(classpath)
+            if check == "report" or self.verbose:
+                analysis.report()
+            if check == "minimize":
+                classpath = analysis.minimized()
+        elif check:
+            print("Unknown classpath-analysis ignored:", check)
+
+        return classpath
+
+    def run(self):
+        """ Run the process. """
+
+        self.prepare()
+
         if not self._argparse:
             self.parse()
 
@@ -550,9 +815,9 @@ class JavaConfig:
                     user_args.append("-%s%s%s" % (name, argsep, value))
 
         param_names = self.parameters.keys()
-        for name in self.parameters:
-            if name not in param_names:
-                self._parse_arg("%s=%s" % (name, param_names[name]), self.parameters,
+        for param in self.get_property("param"):
+            if param["name"] not in param_names:
+                self._parse_arg("%s=%s" % (param["name"], param["value"]), self.parameters,
                                 sep="=")
         user_params = []
         for name in self.parameters:
@@ -566,13 +831,7 @@ class JavaConfig:
         for prop in self.get_property("java-option"):
             java_options.append("-%s" % prop)
 
-        classpath = []
-        if self.get_property("classpath") or self.get_property("jars"):
-            cpset = set()
-            for path in self.get_property("classpath") + self.get_property("jars"):
-                if path not in cpset:
-                    classpath.append(path);
-                    cpset.add(path);
+        classpath = self.classpath()
 
         process = self.get_property("exec")
         classname = self.get_property("class")
@@ -588,7 +847,7 @@ class JavaConfig:
                 classpath,
             )
 
-        command = [process] + sys_props + ["-cp", ":".join(classpath)]
+        command = [process] + java_options + sys_props + ["-cp", ":".join(classpath)]
         command += [classname] + user_args + user_params + self.arguments
 
         if self.debug:
@@ -0,0 +1,228 @@
+"""Compile a Java configuration into a standalone shell launcher."""
+
+import sys
+import os
+import shlex
+import hashlib
+import argparse
+from .javaconfig import JavaConfigurations
+
+# The launcher is a plain POSIX shell script. It parses its arguments
+# the same way JavaConfig.parse() does: -Dname=value, -name:value, and
+# name=value override the defaults from the configuration, --debug and
+# --nogo show the command, other -- options are ignored, and everything
+# else is passed through. Repeated options are passed in command line
+# order rather than grouped by name.
+
+STALE = r'''
+stale=""
+for input in %s; do
+    if [ ! -e "$input" ] || [ "$input" -nt "$0" ]; then
+        stale="$input"
+    fi
+done
+if [ -n "$stale" ]; then
+    echo "$0: launcher is out of date ($stale has changed); recompile it" >&2
+fi
+'''
+
+PREAMBLE = r'''
+q() {
+    case "$1" in
+        *\'*) printf "'%s'" "$(printf '%s' "$1" | sed "s/'/'\\\\''/g")" ;;
+        *) printf "'%s'" "$1" ;;
+    esac
+}
+
+props=""
+args=""
+params=""
+rest=""
+pnames=" "
+anames=" "
+parnames=" "
+debug=""
+nogo=""
+
+for arg in "$@"; do
+    case "$arg" in
+        -D*)
+            body="${arg#-D}"
+            name="${body%%[:=]*}"
+            pnames="$pnames$name "
+            if [ "$name" = "$body" ]; then
+                props="$props $(q "-D$name")"
+            else
+                props="$props $(q "-D$name=${body#"$name"?}")"
+            fi
+            ;;
+        --debug) debug=1 ;;
+        --nogo) nogo=1 ;;
+        --verbose) ;;
+        --*) ;;
+        -*)
+            body="${arg#-}"
+            name="${body%%[:=]*}"
+            anames="$anames$name "
+            if [ "$name" = "$body" ]; then
+                args="$args $(q "-$name")"
+            else
+                args="$args $(q "-$name$argsep${body#"$name"?}")"
+            fi
+            ;;
+        *=*)
+            name="${arg%%[:=]*}"
+            parnames="$parnames$name "
+            params="$params $(q "$name=${arg#"$name"?}")"
+            ;;
+        *) rest="$rest $(q "$arg")" ;;
+    esac
+done
+'''
+
+POSTAMBLE = r'''
+eval "set -- $command $props -cp $classpath $classname $args $params $rest"
+
+if [ -n "$debug" ] || [ -n "$nogo" ]; then
+    echo "$@"
+fi
+if [ -n "$nogo" ]; then
+    exit 0
+fi
+
+exec "$@"
+'''
+
+
+def _words(values):
+    return " ".join(shlex.quote(value) for value in values)
+
+
+def _default(names, var, name, text):
+    # Append the default unless the command line named it already
+    return 'case "$%s" in *%s*) ;; *) %s="$%s "%s ;; esac\n' % (
+        names, shlex.quote(" %s " % name), var, var, shlex.quote(shlex.quote(text)))
+
+
+def fingerprint(inputs):
+    """ Return a fingerprint of the launcher inputs. The first input is the
+    configuration file, which is hashed in full; the rest are classpath
+    entries, which are identified by size and modification time. """
+    digest = hashlib.sha256()
+    for pos, path in enumerate(inputs):
+        digest.update(path.encode("utf-8"))
+        digest.update(b"\0")
+        try:
+            if pos == 0:
+                with open(path, "rb") as source:
+                    digest.update(source.read())
+            else:
+                stat = os.stat(path)
+                digest.update(("%d:%d" % (stat.st_size, stat.st_mtime_ns)).encode("utf-8"))
+        except OSError:
+            digest.update(b"missing")
+        digest.update(b"\0")
+    return "sha256:%s" % digest.hexdigest()
+
+
+def compile_launcher(config, filename):
+    """ Write a shell launcher for the configuration to filename. """
+    # pylint: disable=W0212
+    config.prepare()
+
+    source = config._configurations._config
+    classpath = config.classpath()
+    inputs = [source] + classpath
+    argsep = config.get_property("argsep", ":")
+
+    script = "#!/bin/sh\n"
+    script += "# Generated by javaconfig from %s. Do not edit.\n" % source
+    script += "# javaconfig-fingerprint: %s\n" % fingerprint(inputs)
+    for path in inputs:
+        script += "# javaconfig-input: %s\n" % path
+    script += "\n"
+    script += "argsep=%s\n" % shlex.quote(argsep)
+
+    for prop in config.get_property("envar"):
+        script += "%s=%s\nexport %s\n" % (prop["name"], shlex.quote(prop["value"]), prop["name"])
+
+    script += STALE % _words(inputs)
+    script += PREAMBLE
+    script += "\n"
+
+    for prop in config.get_property("system-property"):
+        script += _default("pnames", "props", prop["name"],
+                           "-D%s=%s" % (prop["name"], prop["value"]))
+    for arg in config.get_property("arg"):
+        script += _default("anames", "args", arg["name"],
+                           "-%s%s%s" % (arg["name"], argsep, arg["value"]))
+    for param in config.get_property("param"):
+        script += _default("parnames", "params", param["name"],
+                           "%s=%s" % (param["name"], param["value"]))
+
+    command = [config.get_property("exec")]
+    command += ["-%s" % opt for opt in config.get_property("java-option")]
+    script += "\n"
+    script += "command=%s\n" % shlex.quote(_words(command))
+    script += "classpath=%s\n" % shlex.quote(shlex.quote(":".join(classpath)))
+    script += "classname=%s\n" % shlex.quote(shlex.quote(config.get_property("class")))
+    script += POSTAMBLE
+
+    # sh reads a script as it runs it, so replace the launcher rather than
+    # rewriting it under a running instance
+    temp = "%s.%d.tmp" % (filename, os.getpid())
+    with open(temp, "w") as launcher:
+        launcher.write(script)
+    os.chmod(temp, 0o755)
+    os.replace(temp, filename)
+
+
+def launcher_is_stale(filename):
+    """ Return True if the inputs to the launcher have changed. """
+    recorded = None
+    inputs = []
+    with open(filename) as launcher:
+        for line in launcher:
+            if line.startswith("# javaconfig-fingerprint: "):
+                recorded = line[len("# javaconfig-fingerprint: "):].strip()
+            elif line.startswith("# javaconfig-input: "):
+                inputs.append(line[len("# javaconfig-input: "):].rstrip("\n"))
+            elif not line.startswith("#"):
+                break
+    if recorded is None:
+        raise RuntimeError("Not a javaconfig launcher: %s" % filename)
+    return fingerprint(inputs) != recorded
+
+
+def main(argv=None):
+    """ Compile (or check) a launcher from the command line. """
+    parser = argparse.ArgumentParser(
+        prog="javaconfig-compile",
+        description="Compile a Java configuration into a shell launcher.")
+    parser.add_argument("--config", help="the configuration file (default ~/.xmlc)")
+    parser.add_argument("--check", action="store_true",
+                        help="report whether an existing launcher is out of date")
+    parser.add_argument("cfgid", nargs="?", help="the configuration to compile")
+    parser.add_argument("launcher", help="the launcher to write (or check)")
+    opts = parser.parse_args(argv)
+
+    if opts.check:
+        if launcher_is_stale(opts.launcher):
+            print("Out of date:", opts.launcher)
+            return 1
+        return 0
+
+    if not opts.cfgid:
+        parser.error("a configuration id is required")
+
+    config = JavaConfigurations(config=opts.config, lazy=True).config(opts.cfgid)
+    if config is None:
+        print("No such configuration:", opts.cfgid)
+        return 1
+
+    compile_launcher(config, opts.launcher)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""A read-through caching Maven repository.
+
+The proxy serves a local directory over HTTP in Maven repository
+layout. When a file isn't in the directory, it's fetched from the
+upstream repositories, in order, and cached. Concurrent requests for
+the same file wait for a single fetch; files that no upstream has are
+remembered for a while so that repeated probes don't go upstream
+again. Repository metadata (maven-metadata.xml) changes over time, so
+cached copies of it are refreshed after a (shorter) interval.
+
+Point a host at the proxy by giving it a single <repo>:
+
+    <repo>http://proxyhost:8080</repo>
+"""
+
+import sys
+import os
+import time
+import argparse
+import posixpath
+import threading
+import http.server
+from .javaconfig import JavaConfigurations
+from .download import download, CHUNK_SIZE
+
+NEGATIVE_TTL = 600
+METADATA_TTL = 3600
+
+CONTENT_TYPES = {
+    ".jar": "application/java-archive",
+    ".pom": "application/xml",
+    ".xml": "application/xml",
+    ".sha1": "text/plain",
+    ".md5": "text/plain",
+}
+
+
+class CachingRepository:
+    """The cache behind the proxy server."""
+
+    def __init__(self, directory, upstreams, negative_ttl=NEGATIVE_TTL,
+                 metadata_ttl=METADATA_TTL, verbose=False):
+        self.directory = os.path.abspath(directory)
+        self.upstreams = [upstream.rstrip("/") for upstream in upstreams]
+        self.negative_ttl = negative_ttl
+        self.metadata_ttl = metadata_ttl
+        self.verbose = verbose
+        self._lock = threading.Lock()
+        self._fetching = {}
+        self._missing = {}
+
+    def relative_path(self, path):
+        """ Return the repository path for a request path, or None if it's
+        unsafe or names a directory rather than a file. """
+        if "?" in path or "#" in path or path.endswith("/"):
+            return None
+        segments = [segment for segment in path.split("/") if segment not in ("", ".")]
+        if not segments or ".." in segments:
+            return None
+        name = segments[-1]
+        if name.endswith((".part", ".refresh", ".tmp")):
+            return None
+        # Files in a Maven repository are either metadata or named after
+        # their artifact (group/artifact/version/artifact-version.jar).
+        # Anything else is a directory, and listings aren't cached.
+        if name.startswith(("maven-metadata", "archetype-catalog")):
+            return "/".join(segments)
+        if len(segments) < 3 or not name.startswith("%s-" % segments[-3]):
+            return None
+        return "/".join(segments)
+
+    def _fresh(self, path, filename):
+        if not os.path.isfile(filename):
+            return False
+        if posixpath.basename(path).startswith("maven-metadata.xml"):
+            return time.time() - os.stat(filename).st_mtime < self.metadata_ttl
+        return True
+
+    def _known_missing(self, path):
+        # Call with self._lock held
+        expires = self._missing.get(path)
+        if expires is None:
+            return False
+        if expires <= time.time():
+            del self._missing[path]
+            return False
+        return True
+
+    def fetch(self, path):
+        """ Return the cached file for path, filling it from upstream if necessary.
+        Returns None if no upstream has it. """
+        path = self.relative_path(path)
+        if path is None:
+            return None
+        filename = os.path.join(self.directory, path)
+        if os.path.isdir(filename):
+            return None
+        if self._fresh(path, filename):
+            return filename
+
+        with self._lock:
+            if self._known_missing(path):
+                return None
+            pathlock = self._fetching.setdefault(path, threading.Lock())
+
+        with pathlock:
+            # Someone else may have filled it (or failed to) while we waited
+            if self._fresh(path, filename):
+                return filename
+            with self._lock:
+                if self._known_missing(path):
+                    return None
+
+            # Stale metadata is replaced, not overwritten in place
+            target = filename
+            if os.path.isfile(filename):
+                target = "%s.refresh" % filename
+
+            # Only remember a miss if every upstream said it doesn't
+            # have the file; an error from one of them might be temporary
+            found = False
+            missing = True
+            for upstream in self.upstreams:
+                if self.verbose:
+                    print("Fill %s from %s" % (path, upstream))
+                try:
+                    result = download("%s/%s" % (upstream, path), target, self.verbose)
+                except OSError as err:
+                    print("Cannot fill %s from %s: %s" % (path, upstream, err))
+                    result = False
+                if result:
+                    found = True
+                    break
+                if result is not None:
+                    missing = False
+
+            if found and target != filename:
+                os.replace(target, filename)
+
+            with self._lock:
+                self._fetching.pop(path, None)
+                if not found:
+                    if os.path.isfile(filename):
+                        # Better a stale copy than none at all
+                        return filename
+                    if missing:
+                        now = time.time()
+                        for expired in [key for key, expires in self._missing.items()
+                                        if expires <= now]:
+                            del self._missing[expired]
+                        self._missing[path] = now + self.negative_ttl
+                    return None
+
+        return filename
+
+
+UNSATISFIABLE = "unsatisfiable"
+
+
+def _parse_range(header, size):
+    """Return the (start, end) of a single byte range, UNSATISFIABLE, or
+    None if the whole file should be sent instead."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, sep, last = header[6:].strip().partition("-")
+    if not sep or not (first.isdigit() or last.isdigit()):
+        return None
+    if not first:
+        # A suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return UNSATISFIABLE
+        return max(0, size - length), size - 1
+    if last and not last.isdigit():
+        return None
+    start = int(first)
+    if last and int(last) < start:
+        # Invalid, so ignored, as RFC 7233 says
+        return None
+    if start >= size:
+        return UNSATISFIABLE
+    if last:
+        return start, min(int(last), size - 1)
+    return start, size - 1
+
+
+class ProxyHandler(http.server.BaseHTTPRequestHandler):
+    """Serve files from the caching repository."""
+
+    def log_message(self, format, *args):  # pylint: disable=W0622
+        if self.server.repository.verbose:
+            super().log_message(format, *args)
+
+    def do_HEAD(self):  # pylint: disable=C0103
+        self._serve(body=False)
+
+    def do_GET(self):  # pylint: disable=C0103
+        self._serve(body=True)
+
+    def _serve(self, body):
+        filename = self.server.repository.fetch(self.path)
+        if filename is None:
+            self.send_error(404)
+            return
+
+        size = os.stat(filename).st_size
+        start, end = 0, size - 1
+        srange = _parse_range(self.headers.get("Range"), size)
+        if srange == UNSATISFIABLE:
+            self.send_response(416)
+            self.send_header("Content-Range", "bytes */%d" % size)
+            self.end_headers()
+            return
+        if srange:
+            start, end = srange
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" % (start, end, size))
+        else:
+            self.send_response(200)
+
+        ctype = CONTENT_TYPES.get(os.path.splitext(filename)[1], "application/octet-stream")
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+        if body:
+            with open(filename, "rb") as data:
+                data.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = data.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+
+
+class ProxyServer(http.server.ThreadingHTTPServer):
+    """An HTTP server for a caching repository."""
+
+    daemon_threads = True
+
+    def __init__(self, address, repository):
+        super().__init__(address, ProxyHandler)
+        self.repository = repository
+
+
+def main(argv=None):
+    """ Run the proxy from the command line. """
+    parser = argparse.ArgumentParser(
+        prog="javaconfig-proxy",
+        description="Serve a read-through caching Maven repository.")
+    parser.add_argument("--config", help="the configuration file (default ~/.xmlc)")
+    parser.add_argument("--upstream", action="append",
+                        help="an upstream repository (default: the configured repos)")
+    parser.add_argument("--directory",
+                        default="%s/.m2/javaconfig-proxy" % os.environ["HOME"],
+                        help="the cache directory")
+    parser.add_argument("--bind", default="", help="the address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="the port to listen on")
+    parser.add_argument("--negative-ttl", type=int, default=NEGATIVE_TTL,
+                        help="seconds to remember files that upstream doesn't have")
+    parser.add_argument("--metadata-ttl", type=int, default=METADATA_TTL,
+                        help="seconds before cached maven-metadata.xml is refreshed")
+    parser.add_argument("--verbose", action="store_true")
+    opts = parser.parse_args(argv)
+
+    upstreams = opts.upstream
+    if not upstreams:
+        upstreams = JavaConfigurations(config=opts.config, lazy=True).repositories
+    if not upstreams:
+        print("No upstream repositories configured")
+        return 1
+
+    repository = CachingRepository(opts.directory, upstreams,
+                                   negative_ttl=opts.negative_ttl,
+                                   metadata_ttl=opts.metadata_ttl,
+                                   verbose=opts.verbose)
+    server = ProxyServer((opts.bind, opts.port), repository)
+    if opts.verbose:
+        print("Serving %s on port %d" % (repository.directory, server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
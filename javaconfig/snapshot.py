@@ -0,0 +1,153 @@
+"""Maven SNAPSHOT metadata and update policies.
+
+A remote repository stores each build of a SNAPSHOT under a timestamped
+name (artifact-3.0.1-20210501.093000-4.jar) and describes the latest
+build in the version directory's maven-metadata.xml, which is fetched
+next to the local jar, read, and removed on each check. Each jar (the
+main jar and each classifier) has its own marker file recording which
+build is installed; its modification time records when the repository
+was last checked for that jar. A jar without a marker, or one that's
+newer than its marker, was put there by something else (mvn install,
+for example) and is treated as a local build: it's never replaced.
+
+The update policy says how often to check again, using Maven's names:
+"always", "daily" (the default), "never", or "interval:N" for every N
+minutes.
+"""
+
+import os
+import time
+import hashlib
+import xml.etree.ElementTree as ET
+
+MARKER = "%s.snapshot"
+FETCHED = "%s.maven-metadata-%s.xml"
+DEFAULT_POLICY = "daily"
+
+
+def valid_policy(policy):
+    """ Return True if policy is a valid update policy. """
+    if policy in ("always", "daily", "never"):
+        return True
+    if policy.startswith("interval:"):
+        return policy[9:].isdigit()
+    return False
+
+
+def is_stale(filename, policy, now=None):
+    """ Return True if the repository should be checked again, given the
+    marker file that records the last check. """
+    if policy == "never":
+        return False
+    if not os.path.isfile(filename):
+        return True
+    if now is None:
+        now = time.time()
+    checked = os.stat(filename).st_mtime
+
+    if policy == "always":
+        return True
+    if policy.startswith("interval:"):
+        return now - checked >= int(policy[9:]) * 60
+    # daily
+    return time.localtime(checked)[0:3] != time.localtime(now)[0:3]
+
+
+def installed(jarloc):
+    """ Return the build recorded as installed at jarloc, or None. """
+    try:
+        with open(MARKER % jarloc) as marker:
+            return marker.read().strip() or None
+    except OSError:
+        return None
+
+
+def is_local(jarloc):
+    """ Return True if the jar at jarloc wasn't installed by us. """
+    try:
+        checked = os.stat(MARKER % jarloc).st_mtime_ns
+    except OSError:
+        return True
+    return os.stat(jarloc).st_mtime_ns > checked
+
+
+def record(jarloc, build):
+    """ Record that build is installed at jarloc, and that we just checked. """
+    temp = "%s.%d.tmp" % (MARKER % jarloc, os.getpid())
+    with open(temp, "w") as marker:
+        marker.write("%s\n" % build)
+    os.replace(temp, MARKER % jarloc)
+
+
+def fetched_metadata(jarloc, repo):
+    """ Return where to fetch the metadata in repo for the jar at jarloc.
+    The name doesn't change from one check to the next, so a download
+    that's interrupted is resumed by the next check. """
+    return FETCHED % (jarloc, hashlib.sha1(repo.encode("utf-8")).hexdigest()[:12])
+
+
+def discard(filename):
+    """ Remove filename, if it exists. """
+    try:
+        os.unlink(filename)
+    except FileNotFoundError:
+        pass
+
+
+def checked(jarloc):
+    """ Record that we just checked, keeping the build recorded at jarloc. """
+    os.utime(MARKER % jarloc)
+
+
+def _children(node, name):
+    # Repository metadata may or may not be in a namespace
+    return [child for child in node if child.tag.rpartition("}")[2] == name]
+
+
+def _text(node, name):
+    found = _children(node, name)
+    if not found or found[0].text is None:
+        return None
+    return found[0].text.strip()
+
+
+def snapshot_versions(filename, version, classifier=""):
+    """ Return the (jar, pom) versions of the latest build described by the
+    metadata in filename, or None if it doesn't describe one. """
+    try:
+        root = ET.parse(filename).getroot()
+    except (OSError, ET.ParseError):
+        return None
+
+    versioning = _children(root, "versioning")
+    if not versioning:
+        return None
+    versioning = versioning[0]
+
+    jar = None
+    pom = None
+    for listing in _children(versioning, "snapshotVersions"):
+        for entry in _children(listing, "snapshotVersion"):
+            extension = _text(entry, "extension")
+            eclassifier = _text(entry, "classifier") or ""
+            if extension == "jar" and eclassifier == classifier:
+                jar = _text(entry, "value")
+            elif extension == "pom" and eclassifier == "":
+                pom = _text(entry, "value")
+
+    snapshot = _children(versioning, "snapshot")
+    if snapshot:
+        stamp = _text(snapshot[0], "timestamp")
+        build = _text(snapshot[0], "buildNumber")
+        if stamp and build:
+            unique = "%s%s-%s" % (version[:-len("SNAPSHOT")], stamp, build)
+        else:
+            # <localCopy>true</localCopy>, or a repository that doesn't use
+            # unique snapshot versions: the file names aren't timestamped
+            unique = version
+        jar = jar or unique
+        pom = pom or unique
+
+    if jar is None:
+        return None
+    return jar, pom or jar
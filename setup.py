@@ -8,4 +8,8 @@ setup(name='javaconfig',
       author_email='ndw@nwalsh.com',
       license='MIT',
       packages=['javaconfig'],
+      entry_points={
+          'console_scripts': ['javaconfig-compile=javaconfig.launcher:main',
+                              'javaconfig-proxy=javaconfig.proxy:main'],
+      },
       zip_safe=False)
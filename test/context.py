@@ -3,3 +3,18 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import javaconfig  # pylint: disable=unused-import, wrong-import-position
+
+def resolve_artifacts(workdir, repo, artifacts, maven_attrs=""):
+    """Resolve a configuration that needs the artifacts from the repository
+    at repo, and return its classpath."""
+    xmlc = os.path.join(str(workdir), "config.xml")
+    with open(xmlc, "w") as cfg:
+        cfg.write("<config>\n  <maven-config %s><repo>file://%s</repo></maven-config>\n"
+                  % (maven_attrs, repo))
+        cfg.write('  <java xml:id="app" exec="/bin/echo" class="Main">\n')
+        for artifact in artifacts:
+            cfg.write('    <maven artifact="%s"/>\n' % artifact)
+        cfg.write("  </java>\n</config>\n")
+    config = javaconfig.JavaConfigurations(config=xmlc).config("app")
+    config.prepare()
+    return config.classpath()
@@ -0,0 +1,158 @@
+import os
+import hashlib
+import threading
+import http.server
+import pytest
+from .context import javaconfig, resolve_artifacts
+from javaconfig.download import download
+
+PAYLOAD = bytes(range(256)) * 1024
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        RangeHandler.requests_seen.append((self.path, self.headers.get("Range")))
+        if self.path.endswith(".sha1"):
+            body = hashlib.sha1(PAYLOAD).hexdigest().encode("ascii")
+            self.send_response(200)
+        elif self.path == "/big.jar":
+            start = 0
+            if self.headers.get("Range"):
+                start = int(self.headers["Range"][6:-1])
+                self.send_response(206)
+                self.send_header("Content-Range", "bytes %d-%d/%d"
+                                 % (start, len(PAYLOAD) - 1, len(PAYLOAD)))
+            else:
+                self.send_response(200)
+            body = PAYLOAD[start:]
+        elif self.path == "/busy.jar":
+            self.send_response(503)
+            body = b""
+        else:
+            self.send_response(404)
+            body = b""
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+@pytest.fixture()
+def server():
+    RangeHandler.requests_seen = []
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%d" % httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+class TestDownload:
+
+    def test_download(self, server, tmp_path):
+        dest = str(tmp_path / "repo" / "big.jar")
+        assert download(server + "/big.jar", dest)
+        with open(dest, "rb") as jar:
+            assert jar.read() == PAYLOAD
+        assert not os.path.exists(dest + ".part")
+
+    def test_resume(self, server, tmp_path):
+        dest = str(tmp_path / "big.jar")
+        with open(dest + ".part", "wb") as part:
+            part.write(PAYLOAD[:1000])
+        assert download(server + "/big.jar", dest)
+        assert ("/big.jar", "bytes=1000-") in RangeHandler.requests_seen
+        with open(dest, "rb") as jar:
+            assert jar.read() == PAYLOAD
+
+    def test_bad_partial(self, server, tmp_path):
+        dest = str(tmp_path / "big.jar")
+        with open(dest + ".part", "wb") as part:
+            part.write(b"x" * 1000)
+        assert not download(server + "/big.jar", dest)
+        assert not os.path.exists(dest)
+        assert not os.path.exists(dest + ".part")
+
+    def test_missing(self, server, tmp_path, capsys):
+        dest = str(tmp_path / "missing.jar")
+        assert download(server + "/missing.jar", dest) is None
+        assert not os.path.exists(dest)
+        assert not os.path.exists(dest + ".part")
+        assert capsys.readouterr().out == ""
+
+    def test_server_error(self, server, tmp_path):
+        dest = str(tmp_path / "busy.jar")
+        assert download(server + "/busy.jar", dest) is False
+        assert not os.path.exists(dest + ".part")
+
+    def test_concurrent_missing(self, server, tmp_path):
+        dest = str(tmp_path / "missing.jar")
+        results = []
+        errors = []
+        def fetch():
+            try:
+                results.append(download(server + "/missing.jar", dest))
+            except Exception as err:  # pylint: disable=broad-except
+                errors.append(err)
+        threads = [threading.Thread(target=fetch) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert results == [None] * 4
+
+    def test_concurrent(self, server, tmp_path):
+        dest = str(tmp_path / "big.jar")
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            download(server + "/big.jar", dest))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [True] * 4
+        with open(dest, "rb") as jar:
+            assert jar.read() == PAYLOAD
+        assert not os.path.exists(dest + ".part")
+
+    def test_file(self, tmp_path):
+        source = tmp_path / "source.jar"
+        source.write_bytes(PAYLOAD)
+        dest = str(tmp_path / "dest" / "source.jar")
+        assert download("file://%s" % source, dest)
+        with open(dest, "rb") as jar:
+            assert jar.read() == PAYLOAD
+
+POM = """<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <dependencies>
+    <dependency>
+      <groupId>org.example</groupId>
+      <artifactId>dep</artifactId>
+      <version>2.0</version>
+    </dependency>
+  </dependencies>
+</project>
+"""
+
+@pytest.fixture()
+def m2repo(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    repo = tmp_path / "repo"
+    for artifact, version, pom in (("lib", "1.0", POM), ("dep", "2.0", "<project/>")):
+        adir = repo / "org" / "example" / artifact / version
+        adir.mkdir(parents=True)
+        (adir / ("%s-%s.pom" % (artifact, version))).write_text(pom)
+        (adir / ("%s-%s.jar" % (artifact, version))).write_bytes(PAYLOAD)
+    return repo
+
+class TestConfigureArtifact:
+
+    def test_dependencies(self, m2repo, tmp_path):
+        classpath = resolve_artifacts(tmp_path, m2repo, ["org.example:lib:1.0"])
+        m2 = tmp_path / "home" / ".m2" / "repository" / "org" / "example"
+        assert classpath == [str(m2 / "lib" / "1.0" / "lib-1.0.jar"),
+                             str(m2 / "dep" / "2.0" / "dep-2.0.jar")]
+        assert (m2 / "lib" / "1.0" / "lib-1.0.pom").is_file()
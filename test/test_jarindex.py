@@ -0,0 +1,59 @@
+import os
+import zipfile
+import pytest
+from .context import javaconfig
+from javaconfig import jarindex
+
+def make_jar(path, entries):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with zipfile.ZipFile(path, "w") as jar:
+        jar.writestr("META-INF/MANIFEST.MF", "Manifest-Version: 1.0\n")
+        for entry in entries:
+            jar.writestr(entry, entry)
+    return path
+
+@pytest.fixture()
+def jars(tmp_path):
+    repo = tmp_path / "repository" / "org" / "example"
+    return [
+        make_jar(str(repo / "lib" / "1.0" / "lib-1.0.jar"),
+                 ["org/example/A.class", "org/example/B.class"]),
+        make_jar(str(repo / "lib" / "2.0" / "lib-2.0.jar"),
+                 ["org/example/A.class", "org/example/B.class"]),
+        make_jar(str(repo / "extra" / "1.0" / "extra-1.0.jar"),
+                 ["org/example/C.class", "org/example/A.class"]),
+        make_jar(str(repo / "data" / "1.0" / "data-1.0.jar"), []),
+        str(tmp_path / "classes/"),
+    ]
+
+class TestJarIndex:
+
+    def test_analysis(self, jars, tmp_path):
+        analysis = jarindex.analyze(jars, cache_dir=str(tmp_path / "cache"))
+        assert analysis.duplicate_classes == {"org.example.A": [jars[0], jars[2]]}
+        assert analysis.split_packages == {"org.example": [jars[0], jars[2]]}
+        assert len(analysis.versions) == 1
+        assert list(analysis.versions.values())[0] == jars[0:2]
+        assert analysis.redundant == [jars[1]]
+        assert analysis.minimized() == [jars[0]] + jars[2:]
+
+    def test_versions_only(self, jars, tmp_path):
+        analysis = jarindex.analyze(jars[0:2], cache_dir=str(tmp_path / "cache"))
+        assert analysis.duplicate_classes == {}
+        assert analysis.split_packages == {}
+        assert list(analysis.versions.values()) == [jars[0:2]]
+        assert analysis.redundant == [jars[1]]
+
+    def test_cache(self, jars, tmp_path):
+        cache = tmp_path / "cache"
+        jarindex.analyze(jars, cache_dir=str(cache))
+        index = jarindex.JarIndex(str(cache))
+        assert (cache / ("%s.json" % index.checksum(jars[0]))).is_file()
+        assert (cache / "checksums.json").is_file()
+        assert sorted(index.entries(jars[0])) == [
+            "META-INF/MANIFEST.MF", "org/example/A.class", "org/example/B.class"]
+
+    def test_not_a_jar(self, tmp_path):
+        xmlc = os.path.join(os.path.dirname(__file__), "java", "not-a-jar.jar")
+        index = jarindex.JarIndex(str(tmp_path / "cache"))
+        assert index.entries(xmlc) is None
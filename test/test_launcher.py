@@ -0,0 +1,72 @@
+import os
+import subprocess
+import pytest
+from .context import javaconfig
+
+CONFIG = """<config>
+  <maven-config><repo>file:///nowhere</repo></maven-config>
+  <java xml:id="base" exec="/bin/echo">
+    <java-option name="Xmx1g"/>
+    <system-property name="a.b" value="it's"/>
+    <envar name="SOME_VAR" value="some value"/>
+  </java>
+  <app xml:id="app" extends="base" class="com.example.Main" argsep=":">
+    <classpath path="*.jar"/>
+    <arg name="x" value="1"/>
+    <param name="p" value="v w"/>
+  </app>
+</config>
+"""
+
+@pytest.fixture()
+def launcher(tmp_path):
+    xmlc = tmp_path / "config.xml"
+    xmlc.write_text(CONFIG)
+    (tmp_path / "a.jar").write_text("")
+    config = javaconfig.JavaConfigurations(config=str(xmlc)).config("app")
+    script = str(tmp_path / "app")
+    javaconfig.compile_launcher(config, script)
+    return script
+
+def run(script, *args):
+    resp = subprocess.run(["/bin/sh", script] + list(args),
+                          capture_output=True, text=True, check=True)
+    return resp.stdout.strip(), resp.stderr.strip()
+
+class TestLauncher:
+
+    def test_defaults(self, launcher):
+        jar = os.path.join(os.path.dirname(launcher), "a.jar")
+        out, err = run(launcher)
+        assert out == "-Xmx1g -Da.b=it's -cp %s com.example.Main -x:1 p=v w" % jar
+        assert err == ""
+
+    def test_overrides(self, launcher):
+        out, _ = run(launcher, "-Da.b=z", "-x=2", "-y", "p=q", "file one", "--other")
+        assert out.endswith("-Da.b=z -cp %s com.example.Main -x:2 -y p=q file one"
+                            % os.path.join(os.path.dirname(launcher), "a.jar"))
+
+    def test_nogo(self, launcher):
+        out, _ = run(launcher, "--nogo")
+        assert out.startswith("/bin/echo -Xmx1g")
+
+    def test_stale(self, launcher):
+        assert not javaconfig.launcher_is_stale(launcher)
+        jar = os.path.join(os.path.dirname(launcher), "a.jar")
+        with open(jar, "w") as jarfile:
+            jarfile.write("changed")
+        os.utime(jar, (os.stat(launcher).st_mtime + 10,) * 2)
+        assert javaconfig.launcher_is_stale(launcher)
+        _, err = run(launcher)
+        assert "out of date" in err
+
+    def test_recompile(self, launcher):
+        inode = os.stat(launcher).st_ino
+        xmlc = os.path.join(os.path.dirname(launcher), "config.xml")
+        config = javaconfig.JavaConfigurations(config=xmlc).config("app")
+        javaconfig.compile_launcher(config, launcher)
+        # Replaced, not rewritten in place
+        assert os.stat(launcher).st_ino != inode
+        assert os.access(launcher, os.X_OK)
+        assert not [name for name in os.listdir(os.path.dirname(launcher))
+                    if name.endswith(".tmp")]
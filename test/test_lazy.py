@@ -0,0 +1,66 @@
+import os
+import shutil
+import pytest
+from .context import javaconfig
+
+@pytest.fixture()
+def lazy_xmlc(tmp_path):
+    xmlc = os.path.join(os.path.dirname(__file__), 'xmlconfig.xml')
+    copy = tmp_path / 'xmlconfig.xml'
+    shutil.copyfile(xmlc, copy)
+    return str(copy)
+
+class TestLazy:
+
+    def test_index(self, lazy_xmlc):
+        javaconfig.JavaConfigurations(config=lazy_xmlc, lazy=True)
+        assert os.path.isfile(lazy_xmlc + ".idx")
+
+    def test_repositories(self, lazy_xmlc):
+        jcs = javaconfig.JavaConfigurations(config=lazy_xmlc, lazy=True)
+        assert jcs.repositories == ["https://repo1.maven.org/maven2",
+                                    "https://oss.sonatype.org/content/repositories/snapshots"]
+        assert jcs.maven_plugin == "org.apache.maven.plugins:maven-dependency-plugin:2.1:get"
+
+    def test_on_demand(self, lazy_xmlc):
+        jcs = javaconfig.JavaConfigurations(config=lazy_xmlc, lazy=True)
+        assert len(jcs._configurations) == 0
+        jcs.config("saxon")
+        assert sorted(jcs._configurations.keys()) == ["bigmem", "java", "saxon"]
+
+    def test_same_as_eager(self, lazy_xmlc):
+        eager = javaconfig.JavaConfigurations(config=lazy_xmlc).config("saxon-9he")
+        javaconfig.JavaConfigurations(config=lazy_xmlc, lazy=True)
+        # The second lazy load reads the sidecar index
+        lazy = javaconfig.JavaConfigurations(config=lazy_xmlc, lazy=True).config("saxon-9he")
+        assert lazy._properties == eager._properties
+
+    def test_unknown(self, lazy_xmlc):
+        jcs = javaconfig.JavaConfigurations(config=lazy_xmlc, lazy=True)
+        assert jcs.config("no-such-config") is None
+
+    def test_stale_index(self, lazy_xmlc):
+        javaconfig.JavaConfigurations(config=lazy_xmlc, lazy=True)
+        with open(lazy_xmlc) as cfg:
+            data = cfg.read()
+        data = data.replace("</config>",
+                            '<java xml:id="added" extends="java" class="Added"/>\n</config>')
+        with open(lazy_xmlc, "w") as cfg:
+            cfg.write(data)
+        jc = javaconfig.JavaConfigurations(config=lazy_xmlc, lazy=True).config("added")
+        assert jc.get_property("class") == "Added"
+        assert jc.get_property("exec") == "/usr/bin/java"
+
+    def test_several_maven_configs(self, tmp_path):
+        xmlc = tmp_path / "config.xml"
+        xmlc.write_text("""<config>
+  <maven-config><repo>http://a</repo></maven-config>
+  <java xml:id="java" exec="/usr/bin/java"/>
+  <maven-config><repo>http://b</repo></maven-config>
+</config>""")
+        eager = javaconfig.JavaConfigurations(config=str(xmlc))
+        javaconfig.JavaConfigurations(config=str(xmlc), lazy=True)
+        lazy = javaconfig.JavaConfigurations(config=str(xmlc), lazy=True)
+        assert eager.repositories == ["http://a", "http://b"]
+        assert lazy.repositories == eager.repositories
+        assert not list(tmp_path.glob("*.tmp"))
@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+import socket
+import functools
+import http.server
+import pytest
+import requests
+from .context import javaconfig
+from javaconfig import proxy
+
+JAR = "org/example/lib/1.0/lib-1.0.jar"
+
+class UpstreamHandler(http.server.SimpleHTTPRequestHandler):
+    seen = []
+    fail = False
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        UpstreamHandler.seen.append(self.path)
+        time.sleep(0.05)
+        if UpstreamHandler.fail:
+            self.send_error(503)
+        else:
+            super().do_GET()
+
+def serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return "http://127.0.0.1:%d" % server.server_address[1]
+
+@pytest.fixture()
+def proxy_uri(tmp_path):
+    UpstreamHandler.seen = []
+    UpstreamHandler.fail = False
+    (tmp_path / "secret.txt").write_text("secret")
+    upstream_dir = tmp_path / "upstream"
+    (upstream_dir / os.path.dirname(JAR)).mkdir(parents=True)
+    (upstream_dir / JAR).write_bytes(b"jar" * 1000)
+    handler = functools.partial(UpstreamHandler, directory=str(upstream_dir))
+    upstream = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    empty = tmp_path / "empty"
+    empty.mkdir()
+
+    repository = proxy.CachingRepository(
+        str(tmp_path / "cache"), ["file://%s" % empty, serve(upstream)])
+    server = proxy.ProxyServer(("127.0.0.1", 0), repository)
+    yield serve(server)
+    server.shutdown()
+    upstream.shutdown()
+    server.server_close()
+    upstream.server_close()
+
+class TestProxy:
+
+    def test_fill(self, proxy_uri, tmp_path):
+        resp = requests.get("%s/%s" % (proxy_uri, JAR))
+        assert resp.status_code == 200
+        assert resp.content == b"jar" * 1000
+        assert (tmp_path / "cache" / JAR).is_file()
+        resp = requests.head("%s/%s" % (proxy_uri, JAR))
+        assert resp.status_code == 200
+        assert UpstreamHandler.seen.count("/%s" % JAR) == 1
+
+    def test_coalesce(self, proxy_uri):
+        results = []
+        def get():
+            results.append(requests.get("%s/%s" % (proxy_uri, JAR)).status_code)
+        threads = [threading.Thread(target=get) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [200] * 5
+        assert UpstreamHandler.seen.count("/%s" % JAR) == 1
+
+    def test_negative(self, proxy_uri):
+        missing = "org/example/lib/2.0/lib-2.0.jar"
+        for _ in range(3):
+            assert requests.get("%s/%s" % (proxy_uri, missing)).status_code == 404
+        assert UpstreamHandler.seen.count("/%s" % missing) == 1
+
+    def test_range(self, proxy_uri):
+        resp = requests.get("%s/%s" % (proxy_uri, JAR), headers={"Range": "bytes=2997-"})
+        assert resp.status_code == 206
+        assert resp.content == b"jar"
+
+    def test_ranges(self, proxy_uri):
+        uri = "%s/%s" % (proxy_uri, JAR)
+        resp = requests.get(uri, headers={"Range": "bytes=-3"})
+        assert resp.status_code == 206
+        assert resp.headers["Content-Range"] == "bytes 2997-2999/3000"
+        assert resp.content == b"jar"
+        resp = requests.get(uri, headers={"Range": "bytes=-5000"})
+        assert resp.status_code == 206
+        assert len(resp.content) == 3000
+        resp = requests.get(uri, headers={"Range": "bytes=0-2"})
+        assert resp.status_code == 206
+        assert resp.content == b"jar"
+        for header in ("bytes=5-2", "bytes=x-", "bytes=-", "items=0-1", "bytes=0-1,4-5"):
+            resp = requests.get(uri, headers={"Range": header})
+            assert resp.status_code == 200
+            assert len(resp.content) == 3000
+        for header in ("bytes=3000-", "bytes=-0"):
+            assert requests.get(uri, headers={"Range": header}).status_code == 416
+
+    def test_traversal(self, proxy_uri, tmp_path):
+        # requests would normalize the path, so send it by hand
+        host, port = proxy_uri[7:].split(":")
+        for path in ("/../secret.txt", "/org/../../secret.txt", "/%2e%2e/secret.txt"):
+            with socket.create_connection((host, int(port))) as sock:
+                sock.sendall(("GET %s HTTP/1.0\r\n\r\n" % path).encode("ascii"))
+                response = sock.makefile("rb").read()
+            assert response.startswith(b"HTTP/1.0 404")
+        assert not list((tmp_path / "cache").rglob("secret.txt"))
+
+    def test_directory(self, proxy_uri):
+        for path in ("org/example/lib/", "org/example/lib", "org/example/lib/1.0"):
+            assert requests.get("%s/%s" % (proxy_uri, path)).status_code == 404
+        assert requests.get("%s/%s" % (proxy_uri, JAR)).status_code == 200
+
+    def test_transient(self, proxy_uri):
+        UpstreamHandler.fail = True
+        assert requests.get("%s/%s" % (proxy_uri, JAR)).status_code == 404
+        UpstreamHandler.fail = False
+        assert requests.get("%s/%s" % (proxy_uri, JAR)).status_code == 200
+
+    def test_expired_misses(self, tmp_path):
+        empty = tmp_path / "empty"
+        empty.mkdir()
+        repository = proxy.CachingRepository(
+            str(tmp_path / "cache"), ["file://%s" % empty], negative_ttl=0)
+        for version in ("1.0", "2.0", "3.0"):
+            path = "/org/example/lib/%s/lib-%s.jar" % (version, version)
+            assert repository.fetch(path) is None
+        assert len(repository._missing) == 1
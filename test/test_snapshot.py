@@ -0,0 +1,148 @@
+import os
+import time
+import pytest
+from .context import javaconfig, resolve_artifacts
+from javaconfig import snapshot
+
+METADATA = """<?xml version="1.0" encoding="UTF-8"?>
+<metadata modelVersion="1.1.0">
+  <groupId>org.example</groupId>
+  <artifactId>lib</artifactId>
+  <version>1.0-SNAPSHOT</version>
+  <versioning>
+    <snapshot>
+      <timestamp>%s</timestamp>
+      <buildNumber>%d</buildNumber>
+    </snapshot>
+    <snapshotVersions>
+      <snapshotVersion>
+        <classifier>data</classifier>
+        <extension>jar</extension>
+        <value>1.0-%s-%d</value>
+      </snapshotVersion>
+    </snapshotVersions>
+  </versioning>
+</metadata>
+"""
+
+def publish(repo, stamp, build):
+    vdir = repo / "org" / "example" / "lib" / "1.0-SNAPSHOT"
+    vdir.mkdir(parents=True, exist_ok=True)
+    (vdir / "maven-metadata.xml").write_text(METADATA % (stamp, build, stamp, build))
+    unique = "1.0-%s-%d" % (stamp, build)
+    (vdir / ("lib-%s.jar" % unique)).write_text(unique)
+    (vdir / ("lib-%s-data.jar" % unique)).write_text("data %s" % unique)
+    (vdir / ("lib-%s.pom" % unique)).write_text("<project/>")
+
+@pytest.fixture()
+def snapshot_repo(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    repo = tmp_path / "repo"
+    publish(repo, "20210501.093000", 1)
+    def load(policy, artifacts=("org.example:lib:1.0-SNAPSHOT",)):
+        return resolve_artifacts(tmp_path, repo, artifacts,
+                                 'snapshot-update="%s"' % policy)
+    return repo, load
+
+def read(path):
+    with open(path) as data:
+        return data.read()
+
+class TestSnapshot:
+
+    def test_versions(self, tmp_path):
+        meta = tmp_path / "maven-metadata.xml"
+        meta.write_text(METADATA % ("20210501.093000", 4, "20210501.093000", 4))
+        assert snapshot.snapshot_versions(str(meta), "1.0-SNAPSHOT") == (
+            "1.0-20210501.093000-4", "1.0-20210501.093000-4")
+        assert snapshot.snapshot_versions(str(meta), "1.0-SNAPSHOT", "data") == (
+            "1.0-20210501.093000-4", "1.0-20210501.093000-4")
+
+    def test_policy(self, tmp_path):
+        meta = tmp_path / "meta.xml"
+        meta.write_text("")
+        now = time.time()
+        os.utime(meta, (now - 7200, now - 7200))
+        assert snapshot.is_stale(str(meta), "always")
+        assert not snapshot.is_stale(str(meta), "never")
+        assert snapshot.is_stale(str(meta), "interval:60")
+        assert not snapshot.is_stale(str(meta), "interval:180")
+        assert snapshot.is_stale(str(meta), "daily", now=now + 86400)
+        assert snapshot.valid_policy("interval:5")
+        assert not snapshot.valid_policy("weekly")
+
+    def test_resolve(self, snapshot_repo):
+        _, load = snapshot_repo
+        jar = load("daily")[0]
+        assert jar.endswith("/1.0-SNAPSHOT/lib-1.0-SNAPSHOT.jar")
+        assert read(jar) == "1.0-20210501.093000-1"
+
+    def test_no_check(self, snapshot_repo):
+        repo, load = snapshot_repo
+        load("daily")
+        publish(repo, "20210502.093000", 2)
+        assert read(load("daily")[0]) == "1.0-20210501.093000-1"
+        assert read(load("never")[0]) == "1.0-20210501.093000-1"
+
+    def test_update(self, snapshot_repo):
+        repo, load = snapshot_repo
+        load("always")
+        publish(repo, "20210502.093000", 2)
+        jar = load("always")[0]
+        assert read(jar) == "1.0-20210502.093000-2"
+        assert os.path.isfile(os.path.join(os.path.dirname(jar), "lib-1.0-20210501.093000-1.jar"))
+
+    def test_classifier(self, snapshot_repo):
+        repo, load = snapshot_repo
+        artifacts = ("org.example:lib:1.0-SNAPSHOT", "org.example:lib:1.0-SNAPSHOT:data")
+        jar, data = load("always", artifacts)
+        assert data.endswith("/lib-1.0-SNAPSHOT-data.jar")
+        assert read(data) == "data 1.0-20210501.093000-1"
+        publish(repo, "20210502.093000", 2)
+        jar, data = load("always", artifacts)
+        assert read(jar) == "1.0-20210502.093000-2"
+        assert read(data) == "data 1.0-20210502.093000-2"
+
+    def test_local(self, snapshot_repo, tmp_path):
+        repo, load = snapshot_repo
+        vdir = tmp_path / "home" / ".m2" / "repository" / "org" / "example" / "lib" / "1.0-SNAPSHOT"
+        vdir.mkdir(parents=True)
+        (vdir / "lib-1.0-SNAPSHOT.jar").write_text("local build")
+        (vdir / "lib-1.0-SNAPSHOT.pom").write_text("<project/>")
+        (repo / "org" / "example" / "lib" / "1.0-SNAPSHOT" / "maven-metadata.xml").unlink()
+        assert read(load("never")[0]) == "local build"
+        publish(repo, "20210502.093000", 2)
+        assert read(load("always")[0]) == "local build"
+
+        # A build installed over one we downloaded is local too
+        (vdir / "lib-1.0-SNAPSHOT.jar").unlink()
+        assert read(load("always")[0]) == "1.0-20210502.093000-2"
+        marker = snapshot.MARKER % (vdir / "lib-1.0-SNAPSHOT.jar")
+        os.utime(marker, (time.time() - 60, time.time() - 60))
+        (vdir / "lib-1.0-SNAPSHOT.jar").write_text("local build")
+        publish(repo, "20210503.093000", 3)
+        assert read(load("always")[0]) == "local build"
+
+    def test_failed_check(self, snapshot_repo):
+        repo, load = snapshot_repo
+        jar = load("interval:60")[0]
+        marker = snapshot.MARKER % jar
+        os.utime(jar, (time.time() - 7300, time.time() - 7300))
+        os.utime(marker, (time.time() - 7200, time.time() - 7200))
+        (repo / "org" / "example" / "lib" / "1.0-SNAPSHOT" / "maven-metadata.xml").unlink()
+        assert read(load("interval:60")[0]) == "1.0-20210501.093000-1"
+        assert time.time() - os.stat(marker).st_mtime < 60
+        assert snapshot.installed(jar) == "1.0-20210501.093000-1"
+
+    def test_metadata(self, snapshot_repo):
+        repo, load = snapshot_repo
+        jar = load("always")[0]
+        meta = repo / "org" / "example" / "lib" / "1.0-SNAPSHOT" / "maven-metadata.xml"
+        fetched = snapshot.fetched_metadata(jar, "file://%s" % repo)
+        # An interrupted download is finished by the next check
+        with open("%s.part" % fetched, "w") as part:
+            part.write(read(meta)[:100])
+        publish(repo, "20210502.093000", 2)
+        assert read(load("always")[0]) == "1.0-20210502.093000-2"
+        assert not [name for name in os.listdir(os.path.dirname(jar))
+                    if "maven-metadata" in name]